@@ -0,0 +1,220 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import node
+from exceptions import FrameTooLarge
+from framing import FrameDecoder
+from outbound import PeerQueue
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_loop():
+    # Every AsyncNode of the process runs on this single loop unless given its own.
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = asyncio.new_event_loop()
+            threading.Thread(target=_shared_loop.run_forever, name="async-node-loop", daemon=True).start()
+        return _shared_loop
+
+
+class AsyncNode(node.Node):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.loop = options.get("loop") or get_shared_loop()
+        self.server = None
+        self.streams = {}
+        self.peer_queues = {}
+        self.wakeups = {}
+
+    def listen(self):
+        asyncio.run_coroutine_threadsafe(self.start_server(), self.loop).result()
+        return self
+
+    async def start_server(self):
+        self.server = await asyncio.start_server(self.__handle_conn, self.host, self.port,
+                                                 backlog=self.max_listens, reuse_address=True,
+                                                 reuse_port=self.reuse_port or None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.logger.info("Node %s is listening on %s.", self.node_name, (self.host, self.port))
+        if self.metrics_port is not None:
+            self.logger.info("Node %s serves its metrics on %s.", self.node_name,
+                             self.metrics.serve(self.host, self.metrics_port))
+        return self
+
+    def connect(self, host, port):
+        asyncio.run_coroutine_threadsafe(self.open_connection(host, port), self.loop).result()
+        return self
+
+    async def open_connection(self, host, port):
+        peer = host, port
+        if not self.__is_stale(peer):
+            return self.streams[peer]
+        self.__close_streams(host, port)
+        try:
+            self.streams[peer] = await asyncio.wait_for(asyncio.open_connection(host, port), self.connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.metrics.increment("connect_failures")
+            raise
+        self.logger.info("Node %s is connected to %s.", self.node_name, peer)
+        return self.streams[peer]
+
+    def disconnect(self, host=None, port=None):
+        self.__call_in_loop(self.__close_streams, host, port)
+        return self
+
+    def drop_peer(self, host, port):
+        self.__call_in_loop(self.__drop_peer, (host, port))
+        return self
+
+    def send_to(self, host, port, data, key=None, version=None):
+        self.__call_in_loop(self.__enqueue, (host, port), data, key, version)
+        return True
+
+    def flush(self, timeout=1.0):
+        # Waiting from the loop itself would block the writers it waits for.
+        if self.__in_loop():
+            return self
+        try:
+            asyncio.run_coroutine_threadsafe(self.flush_async(), self.loop).result(timeout)
+        except concurrent.futures.TimeoutError:
+            pass
+        return self
+
+    async def flush_async(self):
+        while any(self.peer_queues.values()):
+            await asyncio.sleep(0.01)
+
+    def queue_stats(self):
+        return {peer: queue.stats() for peer, queue in list(self.peer_queues.items())}
+
+    def run_periodically(self, interval, callback):
+        async def run():
+            while not self.closing.is_set():
+                await asyncio.sleep(interval)
+                if not self.closing.is_set():
+                    callback()
+
+        self.__call_in_loop(lambda: self.loop.create_task(run()))
+
+    def __in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def __call_in_loop(self, callback, *args):
+        if self.__in_loop():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def __is_stale(self, peer):
+        # Same rule as Node, read from the stream state instead of polling the socket.
+        stream = self.streams.get(peer)
+        return stream is None or stream[0].at_eof() or stream[1].is_closing()
+
+    def __enqueue(self, peer, data, key, version):
+        # Runs on the loop, the queue is drained by a task per peer instead of a thread.
+        if self._in_backoff(peer):
+            return
+        if peer not in self.peer_queues:
+            self.peer_queues[peer] = PeerQueue(capacity=self.send_queue_size, overflow_policy=self.overflow_policy)
+            self.wakeups[peer] = asyncio.Event()
+            self.loop.create_task(self.__drain_peer_queue(peer, self.peer_queues[peer], self.wakeups[peer]))
+        queue = self.peer_queues[peer]
+        if queue.put(data, key, version):
+            self.wakeups[peer].set()
+            return
+        self.metrics.increment("send_queue_overflows")
+        if self.overflow_policy == "disconnect":
+            self.logger.info("Node %s disconnected the slow peer %s.", self.node_name, peer)
+            queue.clear()
+            self.__close_streams(*peer)
+            self._back_off(peer)
+
+    def __drop_peer(self, peer):
+        queue = self.peer_queues.pop(peer, None)
+        if queue is not None:
+            queue.close()
+            self.wakeups.pop(peer).set()
+        self.__close_streams(*peer)
+        self.backoffs.pop(peer, None)
+
+    async def __drain_peer_queue(self, peer, queue, wakeup):
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            if queue.closed:
+                return
+            if queue and (remaining := queue.first_put_at + self.batch_delay - time.monotonic()) > 0 \
+                    and queue.nbytes < self.batch_max_bytes:
+                await asyncio.sleep(remaining)
+            while queue:
+                writer = await self.__writer_for(peer)
+                if queue.closed:
+                    # Dropped while connecting, the new stream must not outlive the queue.
+                    self.__close_streams(*peer)
+                    return
+                if writer is None:
+                    queue.clear()
+                    break
+                data = queue.pop_batch(self.batch_max_bytes)
+                writer.write(data)
+                try:
+                    await asyncio.wait_for(writer.drain(), self.send_timeout)
+                    self.metrics.increment("bytes_out", amount=len(data))
+                except (OSError, asyncio.TimeoutError) as e:
+                    self.metrics.increment("send_failures")
+                    self.logger.info("Node %s failed to send to %s : %r.", self.node_name, peer, e)
+                    self.__close_streams(*peer)
+
+    async def __writer_for(self, peer):
+        for attempt in range(self.max_send_attempts):
+            if self._in_backoff(peer):
+                return None
+            try:
+                _, writer = await self.open_connection(*peer)
+                self.backoffs.pop(peer, None)
+                return writer
+            except (OSError, asyncio.TimeoutError) as e:
+                self.__close_streams(*peer)
+                self.metrics.increment("send_failures")
+                self.logger.info("Node %s failed to send to %s (attempt %d) : %r.", self.node_name, peer,
+                                 attempt + 1, e)
+        self._back_off(peer)
+        return None
+
+    def __close_streams(self, host=None, port=None):
+        peers = list(self.streams) if host is None else [(host, port)]
+        closed_peers = []
+        for peer in peers:
+            stream = self.streams.pop(peer, None)
+            if stream is not None:
+                stream[1].close()
+                closed_peers.append(peer)
+        if closed_peers:
+            self.logger.info("Node %s is disconnected from %s.", self.node_name, closed_peers)
+
+    async def __handle_conn(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        self.logger.info("Node %s accepted a connection from %s.", self.node_name, addr)
+        decoder = FrameDecoder(self.max_recv_size)
+        try:
+            while data := await reader.read(self.recv_chunk_size):
+                self.metrics.increment("bytes_in", amount=len(data))
+                for frame in decoder.feed(data):
+                    self._handle_frame(frame, addr)
+        except FrameTooLarge as e:
+            self.logger.warning("Node %s dropped the connection from %s : %s", self.node_name, addr, e)
+            return
+        except OSError as e:
+            self.logger.info("Node %s lost the connection from %s : %r.", self.node_name, addr, e)
+            return
+        finally:
+            writer.close()
+        self.logger.info("Node %s closed the connection from %s.", self.node_name, addr)
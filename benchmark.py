@@ -0,0 +1,174 @@
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from irc import AsyncIRCNode, IRCNode
+
+TRANSPORTS = {"threads": IRCNode, "asyncio": AsyncIRCNode}
+TOPOLOGIES = ("full", "ring", "star", "random")
+BENCH_CHANNEL = "bench"
+
+
+class CountingNode:
+    # Mixed in front of a node class to count what it puts on the wire.
+    def __init__(self, *args, **kwargs):
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        super().__init__(*args, **kwargs)
+
+    def send_to(self, host, port, data, key=None, version=None):
+        self.bytes_sent += len(data)
+        self.frames_sent += 1
+        return super().send_to(host, port, data, key, version)
+
+
+class Benchmark:
+    def __init__(self, **options):
+        self.node_count = options.get("nodes", 10)
+        self.topology = options.get("topology", "full")
+        self.workload = options.get("workload", "channel")
+        self.message_count = options.get("messages", 1000)
+        self.rate = options.get("rate")
+        self.timeout = options.get("timeout", 30.0)
+        node_class = TRANSPORTS[options.get("transport", "threads")]
+        self.node_class = type(f"Counting{node_class.__name__}", (CountingNode, node_class), {})
+        self.node_options = {
+            "headless": True,
+            "logging_level": 0,
+            "routing_mode": options.get("routing_mode", "flood"),
+            "codec": options.get("codec", "json"),
+            "batch_delay": options.get("batch_delay", 0),
+            "heartbeat_interval": options.get("heartbeat_interval"),
+        }
+        self.nodes = []
+        self.latencies = []
+        self.deliveries = 0
+        self.deliveries_lock = threading.Lock()
+        self.all_delivered = threading.Event()
+        self.expected_deliveries = 0
+
+    def bootstrap_peers(self, index):
+        if index == 0:
+            return []
+        if self.topology == "ring":
+            return [self.nodes[index - 1].get_id()]
+        if self.topology == "star":
+            return [self.nodes[0].get_id()]
+        if self.topology == "random":
+            return [node.get_id() for node in random.sample(self.nodes[:index], min(3, index))]
+        return [node.get_id() for node in self.nodes[:index]]
+
+    def start(self):
+        for index in range(self.node_count):
+            nickname = f"node{index}"
+            node = self.node_class(nickname, known_nodes=self.bootstrap_peers(index),
+                                   output=self.make_sink(), **self.node_options)
+            self.nodes.append(node.listen())
+        for node in self.nodes:
+            node.on_submit(f"/join \"{BENCH_CHANNEL}\"")
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline and not self.converged():
+            time.sleep(0.05)
+        return self
+
+    def converged(self):
+        return all(len(node.known_nodes.members_of(BENCH_CHANNEL)) == self.node_count - 1 for node in self.nodes)
+
+    def make_sink(self):
+        def sink(line):
+            # Benchmark messages end with "bench <sequence> <perf_counter at send time>".
+            parts = line.rsplit(" ", 3)
+            if len(parts) < 3 or parts[-3] != "bench":
+                return
+            latency = time.perf_counter() - float(parts[-1])
+            with self.deliveries_lock:
+                self.latencies.append(latency)
+                self.deliveries += 1
+                if self.deliveries >= self.expected_deliveries:
+                    self.all_delivered.set()
+
+        return sink
+
+    def snapshot(self):
+        return {
+            "bytes": sum(node.bytes_sent for node in self.nodes),
+            "frames": sum(node.frames_sent for node in self.nodes),
+            "duplicates": sum(node.seen_messages.hits for node in self.nodes),
+            "unique": sum(node.seen_messages.misses for node in self.nodes),
+        }
+
+    def run(self):
+        per_message = self.node_count - 1 if self.workload == "channel" else 1
+        self.expected_deliveries = self.message_count * per_message
+        before = self.snapshot()
+        started_at = time.perf_counter()
+        for sequence in range(self.message_count):
+            sender = random.choice(self.nodes)
+            text = f"bench {sequence} {time.perf_counter()!r}"
+            if self.workload == "channel":
+                sender.on_submit(f"/msg \"{BENCH_CHANNEL}\" \"{text}\"")
+            else:
+                receiver = random.choice([node for node in self.nodes if node is not sender])
+                sender.on_submit(f"/msg \"{receiver.nickname}\" \"{text}\"")
+            if self.rate:
+                time.sleep(1 / self.rate)
+        self.all_delivered.wait(self.timeout)
+        elapsed = time.perf_counter() - started_at
+        after = self.snapshot()
+        return self.report(elapsed, {key: after[key] - before[key] for key in after})
+
+    def report(self, elapsed, counters):
+        latencies = sorted(self.latencies)
+        quantile = (lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)]) if latencies else (
+            lambda q: float("nan"))
+        return {
+            "nodes": self.node_count,
+            "topology": self.topology,
+            "workload": self.workload,
+            "routing_mode": self.node_options["routing_mode"],
+            "messages": self.message_count,
+            "delivered": f"{self.deliveries}/{self.expected_deliveries}",
+            "seconds": round(elapsed, 3),
+            "messages_per_second": round(self.message_count / elapsed, 1),
+            "deliveries_per_second": round(self.deliveries / elapsed, 1),
+            "latency_p50_ms": round(quantile(0.50) * 1000, 3),
+            "latency_p99_ms": round(quantile(0.99) * 1000, 3),
+            "latency_mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else float("nan"),
+            "duplicate_receive_ratio": round(counters["duplicates"] / max(counters["unique"], 1), 3),
+            "frames_sent": counters["frames"],
+            "bytes_per_delivered_message": round(counters["bytes"] / max(self.deliveries, 1), 1),
+        }
+
+    def stop(self):
+        for node in self.nodes:
+            node.closing.set()
+            node.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a local mesh of headless IRC nodes and measures delivery.")
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="full")
+    parser.add_argument("--workload", choices=("channel", "private"), default="channel")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--rate", type=float, help="Messages per second, as fast as possible by default.")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="threads")
+    parser.add_argument("--routing-mode", choices=("flood", "gossip"), default="flood")
+    parser.add_argument("--codec", default="json")
+    parser.add_argument("--batch-delay", type=float, default=0)
+    parser.add_argument("--heartbeat-interval", type=float)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    arguments = parser.parse_args()
+    benchmark = Benchmark(**{key: value for key, value in vars(arguments).items() if value is not None})
+    try:
+        report = benchmark.start().run()
+    finally:
+        benchmark.stop()
+    for key, value in report.items():
+        print(f"{key:<30}{value}")
+
+
+if __name__ == '__main__':
+    main()
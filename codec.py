@@ -0,0 +1,54 @@
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JSONCodec:
+    name = "json"
+    tag = 0
+    available = True
+
+    @staticmethod
+    def encode(payload) -> bytes:
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    @staticmethod
+    def decode(body):
+        return json.loads(str(body, "utf-8"))
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    tag = 1
+    available = msgpack is not None
+
+    @staticmethod
+    def encode(payload) -> bytes:
+        return msgpack.packb(payload, use_bin_type=True)
+
+    @staticmethod
+    def decode(body):
+        # Arrays come back as tuples, so (host, port) node ids stay hashable.
+        return msgpack.unpackb(body, raw=False, use_list=False, strict_map_key=False)
+
+
+CODECS = {codec.name: codec for codec in (JSONCodec, MsgpackCodec) if codec.available}
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values()}
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise ValueError(f"Codec {name} is unknown or its dependency is not installed, available : {list(CODECS)}.")
+    return CODECS[name]
+
+
+def encode_payload(payload, codec=JSONCodec) -> bytes:
+    # The leading tag lets every peer decode a body whatever codec its sender picked.
+    return bytes((codec.tag,)) + codec.encode(payload)
+
+
+def decode_payload(body):
+    return CODECS_BY_TAG[body[0]].decode(body[1:])
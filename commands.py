@@ -0,0 +1,42 @@
+import re
+
+COMMAND_PATTERN = re.compile(r"\s*/(\w+)(.*)", re.DOTALL)
+ARGUMENT_PATTERN = re.compile(r"\s+\"((?:[^\"\\]|\\.)*)\"")
+TRAILING_SPACES_PATTERN = re.compile(r"\s*")
+
+
+def tokenize(arguments):
+    # Splits '"a" "b"' into ['a', 'b'], returns None if anything but quoted arguments is found.
+    tokens = []
+    position = 0
+    while argument := ARGUMENT_PATTERN.match(arguments, position):
+        tokens.append(argument.group(1))
+        position = argument.end()
+    if not TRAILING_SPACES_PATTERN.fullmatch(arguments, position):
+        return None
+    return tokens
+
+
+class CommandRegistry:
+    def __init__(self):
+        self.commands = {}
+
+    def command(self, verb, min_args=0, max_args=None):
+        def register(handler):
+            # Handlers are looked up by name on dispatch so subclasses can override them.
+            self.commands[verb] = handler.__name__, min_args, min_args if max_args is None else max_args
+            return handler
+
+        return register
+
+    def dispatch(self, target, line) -> bool:
+        # Calls the handler of the leading /verb with the quoted arguments, returns False if the line is invalid.
+        command = COMMAND_PATTERN.fullmatch(line)
+        if command is None or command.group(1) not in self.commands:
+            return False
+        handler_name, min_args, max_args = self.commands[command.group(1)]
+        arguments = tokenize(command.group(2))
+        if arguments is None or not min_args <= len(arguments) <= max_args:
+            return False
+        getattr(target, handler_name)(*arguments)
+        return True
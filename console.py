@@ -0,0 +1,28 @@
+import sys
+
+
+class Console:
+    def __init__(self, **options):
+        # Headless replacement for GUI, lines go to a pluggable sink and input is read from a stream.
+        sink = options.get("sink")
+        on_submit = options.get("on_submit")
+        on_close = options.get("on_close")
+        self.sink = sink if callable(sink) else print
+        self.input_stream = options.get("input_stream", sys.stdin)
+        self.on_submit = on_submit if callable(on_submit) else lambda x: print(f"Unimplemented on_submit.")
+        self.on_close = on_close if callable(on_close) else lambda: print(f"Unimplemented on_close.")
+        self.closed = False
+
+    def add_line(self, line):
+        self.sink(line)
+
+    def mainloop(self):
+        for message in self.input_stream:
+            if self.closed:
+                break
+            self.on_submit(message.rstrip("\n"))
+        if not self.closed:
+            self.on_close()
+
+    def destroy(self):
+        self.closed = True
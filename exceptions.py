@@ -22,5 +22,8 @@ class UserExited(Exception):
         return self.T.user_closed_connection(self.name)
 
 
-
-
+class FrameTooLarge(Exception):
+    def __init__(self, size, max_size):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(f"Frame of {size} bytes exceeds the maximum frame size of {max_size} bytes.")
@@ -0,0 +1,47 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class PhiAccrualDetector:
+    def __init__(self, expected_interval=1.0, window_size=100, min_interval=0.1):
+        self.expected_interval = expected_interval
+        self.window_size = window_size
+        self.min_interval = min_interval
+        self._intervals = {}  # peer -> (deque of the last intervals, their sum)
+        self._last_heartbeats = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, peer):
+        return peer in self._last_heartbeats
+
+    def heartbeat(self, peer, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_heartbeat = self._last_heartbeats.get(peer)
+            self._last_heartbeats[peer] = now
+            if last_heartbeat is None:
+                return
+            intervals, total = self._intervals.get(peer, (deque(), 0.0))
+            intervals.append(now - last_heartbeat)
+            total += intervals[-1]
+            if len(intervals) > self.window_size:
+                total -= intervals.popleft()
+            self._intervals[peer] = intervals, total
+
+    def silence(self, peer, now=None):
+        now = time.monotonic() if now is None else now
+        last_heartbeat = self._last_heartbeats.get(peer)
+        return 0.0 if last_heartbeat is None else now - last_heartbeat
+
+    def phi(self, peer, now=None):
+        # Heartbeat intervals are modelled as exponentially distributed: phi = -log10(P(interval > silence)).
+        intervals, total = self._intervals.get(peer, ((), 0.0))
+        mean_interval = total / len(intervals) if intervals else self.expected_interval
+        return self.silence(peer, now) / max(mean_interval, self.min_interval) * math.log10(math.e)
+
+    def remove(self, peer):
+        with self._lock:
+            self._last_heartbeats.pop(peer, None)
+            self._intervals.pop(peer, None)
@@ -0,0 +1,41 @@
+import struct
+
+from exceptions import FrameTooLarge
+
+HEADER = struct.Struct(">I")
+
+
+def encode_frame(body: bytes) -> bytes:
+    return HEADER.pack(len(body)) + body
+
+
+class FrameDecoder:
+    def __init__(self, max_frame_size: int = 1024 ** 2):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def feed(self, data: bytes):
+        # Yielded frames are views into the internal buffer, they are only valid until the next iteration.
+        self._buffer += data
+        offset = 0
+        try:
+            with memoryview(self._buffer) as view:
+                while len(view) - offset >= HEADER.size:
+                    (size,) = HEADER.unpack_from(view, offset)
+                    if size > self.max_frame_size:
+                        raise FrameTooLarge(size, self.max_frame_size)
+                    start = offset + HEADER.size
+                    end = start + size
+                    if end > len(view):
+                        break
+                    frame = view[start:end]
+                    offset = end
+                    try:
+                        yield frame
+                    finally:
+                        frame.release()
+        finally:
+            del self._buffer[:offset]
@@ -1,3 +1,4 @@
+import queue
 import tkinter as tk
 import sys
 
@@ -13,11 +14,15 @@ class GUI(tk.Tk):
         on_close = options.get("on_close")
         self.on_submit = on_submit if callable(on_submit) else lambda x: print(f"Unimplemented on_submit.")
         self.on_close = on_close if callable(on_close) else lambda x: print(f"Unimplemented on_close.")
+        self.max_lines = options.get("max_lines", 10_000)
+        self.refresh_interval = int(1000 / options.get("max_refresh_rate", 20))  # ms
+        self.pending_lines = queue.SimpleQueue()
         self.set_window_properties(options)
         self.input_content = tk.StringVar()
         self.input_box, self.text_box_frame, self.text_box, self.scrollbar = (None,) * 4
         self.init_input_box()
         self.init_text_box()
+        self.after(self.refresh_interval, self.render_pending_lines)
 
     def set_window_properties(self, options):
         self.title(options.get("title", f"{self.title}"))
@@ -50,10 +55,24 @@ class GUI(tk.Tk):
         self.text_box.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=1)
 
     def add_line(self, line):
-        self.text_box["state"] = tk.NORMAL
-        self.text_box.insert(tk.END, line + "\n")
-        self.text_box["state"] = tk.DISABLED
-        self.text_box.see(tk.END)
+        # Called from network threads too, so only queue the line and let the Tk loop render it.
+        self.pending_lines.put(line)
+
+    def render_pending_lines(self):
+        lines = []
+        while not self.pending_lines.empty():
+            lines.append(self.pending_lines.get_nowait())
+        if lines:
+            # Lines beyond the scrollback would be trimmed right away, don't even insert them.
+            lines = lines[-self.max_lines:]
+            self.text_box["state"] = tk.NORMAL
+            self.text_box.insert(tk.END, "\n".join(lines) + "\n")
+            line_count = int(self.text_box.index("end-1c").split(".")[0]) - 1
+            if line_count > self.max_lines:
+                self.text_box.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+            self.text_box["state"] = tk.DISABLED
+            self.text_box.see(tk.END)
+        self.after(self.refresh_interval, self.render_pending_lines)
 
     def submit_message(self, _):
         message = self.input_content.get()
@@ -0,0 +1,164 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+# One index entry per record: local arrival time, offset and length of the record in its segment.
+INDEX_ENTRY = struct.Struct(">dQI")
+
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        self.timestamps = []
+        self.entries = []  # (offset, length) pairs, in the order of self.timestamps
+        self.map = None
+        index = b""
+        log_size = 0
+        if os.path.exists(f"{path}.idx"):
+            with open(f"{path}.idx", "rb") as index_file:
+                index = index_file.read()
+        if os.path.exists(f"{path}.log"):
+            log_size = os.path.getsize(f"{path}.log")
+        # A partially written trailing entry is dropped, as are entries pointing past the end of the log.
+        self.size = 0
+        for timestamp, offset, length in INDEX_ENTRY.iter_unpack(index[:len(index) - len(index) % INDEX_ENTRY.size]):
+            if offset != self.size or offset + length > log_size:
+                break
+            self.timestamps.append(timestamp)
+            self.entries.append((offset, length))
+            self.size = offset + length
+        # Both files are cut back to the last complete record so that appends stay aligned.
+        self.log = open(f"{path}.log", "ab", buffering=0)
+        self.index_file = open(f"{path}.idx", "ab", buffering=0)
+        self.log.truncate(self.size)
+        self.index_file.truncate(len(self.entries) * INDEX_ENTRY.size)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, timestamp, record):
+        offset = self.size
+        self.log.write(record)
+        self.size += len(record)
+        self.index_file.write(INDEX_ENTRY.pack(timestamp, offset, len(record)))
+        self.timestamps.append(timestamp)
+        self.entries.append((offset, len(record)))
+
+    def read(self, position):
+        offset, length = self.entries[position]
+        if self.map is None or len(self.map) < offset + length:
+            # Records are only ever appended, so the mapping is renewed when it no longer covers the log.
+            if self.map is not None:
+                self.map.close()
+            with open(f"{self.path}.log", "rb") as log:
+                self.map = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map[offset:offset + length]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.log.close()
+        self.index_file.close()
+
+
+class ChannelLog:
+    def __init__(self, directory, segment_size):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Segments are named after the position of their first record in the channel.
+        names = sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".log"))
+        self.segments = [Segment(os.path.join(directory, name)) for name in names]
+        self.starts = []
+        position = 0
+        for segment in self.segments:
+            self.starts.append(position)
+            position += len(segment)
+        self.length = position
+
+    def append(self, timestamp, record):
+        with self.lock:
+            if not self.segments or self.segments[-1].size >= self.segment_size:
+                self.segments.append(Segment(os.path.join(self.directory, f"{self.length:020d}")))
+                self.starts.append(self.length)
+            self.segments[-1].append(timestamp, record)
+            self.length += 1
+
+    def position_of(self, timestamp):
+        # Position of the first record that arrived at or after the timestamp.
+        with self.lock:
+            for start, segment in zip(self.starts, self.segments):
+                if segment.timestamps and segment.timestamps[-1] >= timestamp:
+                    return start + bisect.bisect_left(segment.timestamps, timestamp)
+            return self.length
+
+    def read(self, start, stop):
+        with self.lock:
+            records = []
+            segment_index = max(bisect.bisect_right(self.starts, start) - 1, 0)
+            for position in range(start, min(stop, self.length)):
+                while position >= self.starts[segment_index] + len(self.segments[segment_index]):
+                    segment_index += 1
+                records.append(self.segments[segment_index].read(position - self.starts[segment_index]))
+            return records
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+
+
+def channel_directory_name(channel):
+    # Channel names come from peers: the prefix rules out "", "." and "..", long names are hashed to fit a file name.
+    name = f"channel-{quote(channel, safe='')}"
+    if len(name) > 200:
+        name = f"channel-sha256-{hashlib.sha256(channel.encode()).hexdigest()}"
+    return name
+
+
+class MessageHistory:
+    def __init__(self, directory, segment_size=4 * 1024 ** 2, max_open_channels=64):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_open_channels = max_open_channels
+        self.channels = OrderedDict()  # least recently used first
+        self.lock = threading.Lock()
+
+    def channel_log(self, channel):
+        # Callers hold self.lock, a log closed to stay under max_open_channels is reopened on next use.
+        if channel in self.channels:
+            self.channels.move_to_end(channel)
+            return self.channels[channel]
+        path = os.path.join(self.directory, channel_directory_name(channel))
+        self.channels[channel] = ChannelLog(path, self.segment_size)
+        while len(self.channels) > self.max_open_channels:
+            self.channels.popitem(last=False)[1].close()
+        return self.channels[channel]
+
+    def append(self, channel, message, timestamp):
+        # Messages are [sender, sent_at, text] lists, indexed by their local arrival time.
+        with self.lock:
+            self.channel_log(channel).append(timestamp, json.dumps(message, separators=(",", ":")).encode())
+
+    def messages(self, channel, count=None, since=None):
+        # Returns the last count messages of the channel, only those that arrived since the timestamp if given.
+        with self.lock:
+            channel_log = self.channel_log(channel)
+            start = 0 if since is None else channel_log.position_of(since)
+            stop = channel_log.length
+            if count is not None:
+                start = max(start, stop - count)
+            records = channel_log.read(start, stop)
+        return [json.loads(record) for record in records]
+
+    def close(self):
+        with self.lock:
+            for channel_log in self.channels.values():
+                channel_log.close()
@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+
+from irc import AsyncIRCNode, IRCNode, as_node_id
+from seen_cache import SharedSeenCache
+
+# State every worker has to know, whichever worker the payload arrived on.
+SHARED_TYPES = ("ClosedNode", "UpdatedNode", "NewChannel", "SyncResponse")
+logger = logging.getLogger(__name__)
+
+
+class HubWorker(IRCNode):
+    def __init__(self, nickname, worker_index, siblings, shared_seen, **node_options):
+        # Nobody reads a worker's screen, the lines it would show go to its logger instead of stdout.
+        node_options.setdefault("output", self.log_line)
+        super().__init__(nickname, **node_options)
+        self.worker_index = worker_index
+        self.siblings = siblings  # queues of the other workers of the hub
+        self.seen_messages = SharedSeenCache(*shared_seen, max_age=node_options.get("seen_max_age", 10 * 60))
+
+    def log_line(self, line):
+        self.logger.debug("Node %s : %s", self.node_name, line)
+
+    def join_network(self):
+        # The first worker speaks for the hub, the others learn the network from what it forwards.
+        if self.worker_index == 0:
+            super().join_network()
+
+    def send_heartbeats(self):
+        if self.worker_index == 0:
+            self.send(None, "Heartbeat")
+        self.detect_failures()
+
+    def _handle_incoming_data(self, payload):
+        # A peer keeps its connection to a single worker, the others would take it for dead without its heartbeats.
+        if payload.get("type") == "Heartbeat":
+            self.forward_to_siblings(payload)
+        super()._handle_incoming_data(payload)
+
+    def handle_payload(self, payload, propagate=True):
+        super().handle_payload(payload, propagate)
+        if propagate and payload.get("type") in SHARED_TYPES:
+            self.forward_to_siblings(payload)
+
+    def forward_to_siblings(self, payload):
+        for sibling in self.siblings:
+            sibling.put(payload)
+
+    def apply_sibling_payload(self, payload):
+        # Already deduplicated and relayed by the worker it arrived on.
+        if payload.get("type") == "Heartbeat":
+            self.handle_heartbeat(as_node_id(payload["sender"]))
+        else:
+            self.handle_payload(payload, propagate=False)
+
+    def close(self):
+        if self.worker_index == 0:
+            self.on_close()
+        else:
+            self.closing.set()
+            self.flush()
+            self.disconnect()
+            self.metrics.close()
+        self.seen_messages.close()
+
+
+class AsyncHubWorker(HubWorker, AsyncIRCNode):
+    pass
+
+
+WORKER_CLASSES = {"threads": HubWorker, "asyncio": AsyncHubWorker}
+
+
+def run_worker(worker_index, nickname, known_nodes, node_options, shared_seen, queues, ready, transport):
+    if node_options.get("metrics_port"):
+        node_options = dict(node_options, metrics_port=node_options["metrics_port"] + worker_index)
+    siblings = [sibling for index, sibling in enumerate(queues) if index != worker_index]
+    worker = WORKER_CLASSES[transport](nickname, worker_index, siblings, shared_seen, known_nodes=known_nodes,
+                                       node_name=f"{nickname}#{worker_index}", **node_options)
+    worker.listen()
+    ready.put(worker_index)
+    inbox = queues[worker_index]
+    while (payload := inbox.get()) is not None:
+        worker.apply_sibling_payload(payload)
+    worker.close()
+
+
+class Hub:
+    def __init__(self, nickname, workers=None, known_nodes=None, transport="threads", **node_options):
+        self.nickname = nickname
+        self.worker_count = workers or os.cpu_count() or 1
+        self.known_nodes = list(known_nodes or [])
+        self.transport = transport
+        if node_options.pop("history_dir", None) is not None:
+            logger.warning("Hub %s does not keep history, its workers would each hold a part of it.", nickname)
+        self.node_options = node_options
+        self.host = node_options.get("host", "127.0.0.1")
+        self.port = node_options.get("port", 0)
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = []
+        self.queues = []
+        self.memory = None
+
+    def get_id(self):
+        return self.host, self.port
+
+    def start(self, timeout=30.0):
+        # Workers listen on one port with SO_REUSEPORT, a bound placeholder reserves it until they all do.
+        placeholder = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        placeholder.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        placeholder.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        placeholder.bind((self.host, self.port))
+        self.port = placeholder.getsockname()[1]
+        slots = 4 * self.node_options.get("seen_capacity", 100_000)
+        shared_seen, self.memory = SharedSeenCache.create(slots=slots, context=self.context)
+        self.queues = [self.context.Queue() for _ in range(self.worker_count)]
+        ready = self.context.Queue()
+        node_options = dict(self.node_options, host=self.host, port=self.port, reuse_port=True,
+                            headless=True)
+        for worker_index in range(self.worker_count):
+            process = self.context.Process(target=run_worker, daemon=True, args=(
+                worker_index, self.nickname, self.known_nodes, node_options, shared_seen, self.queues, ready,
+                self.transport))
+            process.start()
+            self.processes.append(process)
+        try:
+            for _ in range(self.worker_count):
+                ready.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise TimeoutError(f"Hub {self.nickname} workers did not start within {timeout}s.")
+        finally:
+            placeholder.close()
+        return self
+
+    def stop(self, timeout=5.0):
+        for inbox in self.queues:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Runs an IRC node as a pool of worker processes sharing one port.")
+    parser.add_argument("nickname")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Number of worker processes, one per core by default.")
+    parser.add_argument("--join", action="append", default=[], metavar="HOST:PORT",
+                        help="Address of a known node, may be repeated.")
+    parser.add_argument("--routing-mode", choices=("flood", "gossip"), default="flood")
+    parser.add_argument("--asyncio", action="store_true", help="Use the asyncio transport.")
+    parser.add_argument("--metrics-port", type=int, help="Serve the metrics of worker i over HTTP on this port + i.")
+    arguments = parser.parse_args()
+    logging.basicConfig(format="%(message)s")
+    known_nodes = [(host, int(port)) for host, port in (address.rsplit(":", 1) for address in arguments.join)]
+    hub = Hub(arguments.nickname, workers=arguments.workers, known_nodes=known_nodes,
+              transport="asyncio" if arguments.asyncio else "threads", host=arguments.host, port=arguments.port,
+              routing_mode=arguments.routing_mode, metrics_port=arguments.metrics_port).start()
+    print(f"Hub {arguments.nickname} is listening on {hub.get_id()} with {hub.worker_count} workers.")
+    try:
+        while all(process.is_alive() for process in hub.processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.stop()
@@ -1,31 +1,107 @@
-import json
-import re
+import itertools
+import math
+import os
+import random
 import time
 
 import node
-from gui import GUI
+from async_node import AsyncNode
+from codec import CODECS, JSONCodec, encode_payload
+from commands import CommandRegistry
+from console import Console
+from failure_detector import PhiAccrualDetector
+from framing import encode_frame
+from history import MessageHistory
+from membership import Membership
+from seen_cache import SeenCache
 from translations import Translations
 
 
+def as_node_id(value):
+    # Node ids are (host, port) tuples, but JSON turns them into lists on the way.
+    return tuple(value) if value is not None else None
+
+
+command_registry = CommandRegistry()
+
+
 class IRCNode(node.Node):
     def __init__(self, nickname, known_nodes=None, lang="en", **node_options):
         node_options["node_name"] = node_options.get("node_name", nickname)
         super().__init__(**node_options)
         if known_nodes is None:
             known_nodes = []
-        self.known_nodes = dict.fromkeys(known_nodes, {})
+        self.known_nodes = Membership()
         self.known_channels = {"default": {"key": None}}
+        self.routing_mode = node_options.get("routing_mode", "flood")
+        self.gossip_fanout = node_options.get("gossip_fanout")
+        # Gossip may miss a node now and then, periodic anti-entropy repairs what it missed.
+        self.sync_interval = node_options.get("sync_interval", 5.0 if self.routing_mode == "gossip" else None)
+        self.heartbeat_interval = node_options.get("heartbeat_interval", 1.0)
+        self.suspicion_threshold = node_options.get("suspicion_threshold", 3.0)
+        self.eviction_timeout = node_options.get("eviction_timeout", 30.0)
+        self.failure_detector = PhiAccrualDetector(expected_interval=self.heartbeat_interval or 1.0)
+        self.suspected_nodes = set()
+        for node_id in known_nodes:
+            self.update_known_node(as_node_id(node_id), {})
         self.nickname = nickname
         self.away = False
         self.away_msg = None
         self.current_channel = "default"
-        self.hash_history = []
+        self.version = time.time_ns()
+        self.seen_messages = SeenCache(capacity=node_options.get("seen_capacity", 100_000),
+                                       max_age=node_options.get("seen_max_age", 10 * 60))
+        self.instance_id = os.urandom(8)
+        history_dir = node_options.get("history_dir")
+        self.history = MessageHistory(history_dir) if history_dir is not None else None
+        self.history_replay = node_options.get("history_replay", 50)
+        self.history_max_replay = node_options.get("history_max_replay", 500)
+        self.message_sequence = itertools.count()
         self.lang = lang
         self.T = Translations(lang=self.lang)
-        self.gui = GUI(title=self.node_name, on_submit=self.on_submit, on_close=self.on_close)
+        if node_options.get("headless", False):
+            self.ui = Console(sink=node_options.get("output"), on_submit=self.on_submit, on_close=self.on_close)
+        else:
+            from gui import GUI  # Tk is only needed with a window
+            gui_options = {name: node_options[name] for name in ("max_lines", "max_refresh_rate")
+                           if name in node_options}
+            self.ui = GUI(title=self.node_name, on_submit=self.on_submit, on_close=self.on_close, **gui_options)
 
     def known_nicknames(self):
-        return list(map(lambda x: x["nickname"], self.known_nodes.values()))
+        return self.known_nodes.nicknames_in()
+
+    def update_known_node(self, node_id, node_data) -> bool:
+        # Returns False if the data was ignored, being about this node or older than what is known.
+        if node_id == self.get_id():
+            return False
+        is_new_node = self.known_nodes.update(node_id, node_data)
+        if is_new_node and node_id not in self.failure_detector:
+            self.failure_detector.heartbeat(node_id)
+        return is_new_node is not None
+
+    def remove_known_node(self, node_id):
+        self.failure_detector.remove(node_id)
+        self.suspected_nodes.discard(node_id)
+        self.known_nodes.remove(node_id)
+        self.drop_peer(*node_id)
+
+    def gossip_view_size(self):
+        if self.gossip_fanout is not None:
+            return self.gossip_fanout
+        return math.ceil(math.log(len(self.known_nodes) + 1)) + 2
+
+    def heartbeat_spread(self):
+        # How many heartbeat intervals pass, on average, between two heartbeats from the same peer.
+        if self.routing_mode != "gossip" or not self.known_nodes:
+            return 1.0
+        return max(1.0, len(self.known_nodes) / self.gossip_view_size())
+
+    def flood_targets(self, sender):
+        if self.routing_mode == "gossip":
+            # Fresh targets for every send and relay, so no node depends on being in someone's fixed view.
+            candidates = [node_id for node_id in self.known_nodes if node_id != sender]
+            return random.sample(candidates, min(self.gossip_view_size(), len(candidates)))
+        return list(self.known_nodes)
 
     def known_channel_names(self):
         return list(self.known_channels.keys())
@@ -33,6 +109,14 @@ class IRCNode(node.Node):
     def get_id(self):
         return self.host, self.port
 
+    def next_message_id(self):
+        # Random per-process prefix + sequence number: unique across the mesh without hashing the payload.
+        return (self.instance_id + next(self.message_sequence).to_bytes(8, "big")).hex()
+
+    def bump_version(self):
+        # Versions order the updates of a node, time based so that a restarted node supersedes its old records.
+        self.version = max(self.version + 1, time.time_ns())
+
     def get_self(self):
         return (self.get_id(), {
             "nickname": self.nickname,
@@ -41,133 +125,302 @@ class IRCNode(node.Node):
             "current_channel": self.current_channel,
             "host": self.host,
             "port": self.port,
+            "codecs": [self.codec.name, *(name for name in CODECS if name != self.codec.name)],
+            "version": self.version,
+            "history": self.history is not None,
         })
 
+    def listen(self):
+        super().listen()
+        self.join_network()
+        if self.heartbeat_interval:
+            self.run_periodically(self.heartbeat_interval, self.send_heartbeats)
+        if self.sync_interval:
+            self.run_periodically(self.sync_interval, self.request_sync)
+        return self
+
+    def send_heartbeats(self):
+        self.send(None, "Heartbeat")
+        self.detect_failures()
+
+    def detect_failures(self):
+        # Suspected nodes are left out of the fan-out, silent ones are evicted.
+        now = time.monotonic()
+        spread = self.heartbeat_spread()
+        self.failure_detector.expected_interval = self.heartbeat_interval * spread
+        for node_id in self.known_nodes:
+            if self.failure_detector.silence(node_id, now) >= self.eviction_timeout * spread:
+                self.logger.info("Node %s evicted the unresponsive node %s.", self.node_name, node_id)
+                self.remove_known_node(node_id)
+            elif self.failure_detector.phi(node_id, now) >= self.suspicion_threshold:
+                self.suspected_nodes.add(node_id)
+            else:
+                self.suspected_nodes.discard(node_id)
+
+    def handle_heartbeat(self, node_id):
+        self.failure_detector.heartbeat(node_id)
+        self.suspected_nodes.discard(node_id)
+        if node_id not in self.known_nodes:
+            # Back from an eviction or never announced to us, catch up with it directly.
+            self.request_sync(node_id)
+
+    def join_network(self):
+        self.send(self.get_self(), "UpdatedNode")
+        self.request_sync()
+
+    def request_sync(self, node_id=None):
+        # Anti-entropy: a single peer answers with the records and channels our digest is missing.
+        if node_id is None:
+            known_node_ids = list(self.known_nodes)
+            if not known_node_ids:
+                return
+            node_id = random.choice(known_node_ids)
+        digest = {"node": self.get_self(), "nodes": self.known_nodes.digest(), "channels": self.known_channel_names()}
+        self.send(digest, "SyncRequest", receiver=node_id)
+
+    def handle_sync_request(self, digest):
+        node_id, node_data = digest["node"]
+        node_id = as_node_id(node_id)
+        self.update_known_node(node_id, node_data)
+        versions = {as_node_id(known_node_id): version for known_node_id, version in digest["nodes"]}
+        records = [record for record in self.known_nodes.delta(versions) if record[0] != node_id]
+        if self.get_id() not in versions:
+            # The requester evicted us or never knew us, a newer version gets past its tombstone.
+            self.bump_version()
+        if self.version > versions.get(self.get_id(), -1):
+            records.append(self.get_self())
+        known_channel_names = set(digest["channels"])
+        channels = [channel for channel in self.known_channels.items() if channel[0] not in known_channel_names]
+        self.send({"nodes": records, "channels": channels}, "SyncResponse", receiver=node_id)
+
+    def handle_sync_response(self, delta):
+        for node_id, node_data in delta["nodes"]:
+            self.update_known_node(as_node_id(node_id), node_data)
+        for channel_name, channel_data in delta["channels"]:
+            self.known_channels.setdefault(channel_name, channel_data)
+
+    def record_message(self, channel, sender, sent_at, message):
+        # Only known channels get a log, a peer can't make us open one per made-up channel name.
+        if self.history is not None and channel in self.known_channels:
+            self.history.append(channel, [sender, sent_at, message], time.time())
+
+    def request_history(self, channel, count=None, since=None):
+        # Asks a single peer keeping a history, preferably a member of the channel, instead of the whole network.
+        keeps_history = [node_id for node_id in self.known_nodes
+                         if (self.known_nodes.get(node_id) or {}).get("history")]
+        if not keeps_history:
+            return False
+        members = self.known_nodes.members_of(channel)
+        node_id = random.choice([node_id for node_id in keeps_history if node_id in members] or keeps_history)
+        self.send({"channel": channel, "count": count, "since": since}, "HistoryRequest", receiver=node_id)
+        return True
+
+    def handle_history_request(self, sender, request):
+        count = min(request["count"] or self.history_max_replay, self.history_max_replay)
+        messages = []
+        if self.history is not None and request["channel"] in self.known_channels:
+            messages = self.history.messages(request["channel"], count, request["since"])
+        self.send({"channel": request["channel"], "messages": messages}, "HistoryResponse", receiver=sender)
+
+    def handle_history_response(self, response):
+        channel = response["channel"]
+        if self.current_channel != channel:
+            return
+        # Logs are in arrival order at the peer, shown in sending order.
+        for sender, _, message in sorted(response["messages"], key=lambda message: message[1]):
+            self.ui.add_line(f"[{channel}] {sender} : {message}")
+
     def _handle_incoming_data(self, payload):
-        if payload["hash"] in self.hash_history:
+        payload_type = payload.get("type")
+        self.metrics.increment("messages_in", payload_type)
+        if payload_type == "Heartbeat":
+            # Heartbeats are sent straight to every peer and never relayed, no need to deduplicate them.
+            self.handle_heartbeat(as_node_id(payload["sender"]))
             return
+        if not self.seen_messages.add(payload["id"], payload["sent_at"]):
+            self.metrics.increment("duplicates_suppressed", payload_type)
+            return
+        self.handle_payload(payload)
+
+    def handle_payload(self, payload, propagate=True):
+        # Applies a deduplicated payload, then relays it unless it was routed or propagate is False.
         payload_type = payload.get("type")
-        propagate = True
         if payload_type == "ClosedNode":
-            node_id = payload.get("data")
-            if node_id in self.known_nodes:
-                del self.known_nodes[node_id]
+            self.remove_known_node(as_node_id(payload.get("data")))
         elif payload_type == "UpdatedNode":
             node_id, node_data = payload.get("data")
-            self.known_nodes[node_id] = node_data
+            # An outdated update is not relayed, it could only hold back the newer one.
+            propagate = self.update_known_node(as_node_id(node_id), node_data) and propagate
+        elif payload_type == "NewChannel":
+            channel_name, channel_data = payload.get("data")
+            self.known_channels.setdefault(channel_name, channel_data)
+        elif payload_type == "SyncRequest":
+            self.handle_sync_request(payload.get("data"))
+            propagate = False
+        elif payload_type == "SyncResponse":
+            self.handle_sync_response(payload.get("data"))
+            propagate = False
+        elif payload_type == "HistoryRequest":
+            self.handle_history_request(as_node_id(payload.get("sender")), payload.get("data"))
+            propagate = False
+        elif payload_type == "HistoryResponse":
+            self.handle_history_response(payload.get("data"))
+            propagate = False
         elif payload_type == "InviteMessage":
-            if self.get_id() == payload.get("receiver"):
+            if self.get_id() == as_node_id(payload.get("receiver")):
                 message = payload.get("data")
-                self.gui.add_line(message)
+                self.ui.add_line(message)
                 propagate = False
         elif payload_type == "ChannelMessage":
             channel = payload.get("receiver")
+            message = payload.get("data")
+            sender = payload.get("sender")
+            self.record_message(channel, sender, payload.get("sent_at"), message)
             if self.current_channel == channel:
-                message = payload.get("data")
-                sender = payload.get("sender")
                 new_line = f"[{channel}] {sender} : {message}"
-                self.gui.add_line(new_line)
+                self.ui.add_line(new_line)
         elif payload_type == "PrivateMessage":
             if self.nickname == payload.get("receiver"):
                 message = payload.get("data")
                 sender = payload.get("sender")
                 new_line = f"{sender} : {message}"
-                self.gui.add_line(new_line)
+                self.ui.add_line(new_line)
+                propagate = False
         else:
-            print(f"Received invalid payload : {payload}\n", end="")
-        if propagate:
+            self.logger.warning("Node %s received an invalid payload : %s.", self.node_name, payload)
+        if propagate and not payload.get("routed"):
             self.send(payload["data"], payload_type, sender=payload["sender"], receiver=payload["receiver"],
-                      data_hash=payload["hash"], timestamp=payload["sent_at"])
+                      message_id=payload["id"], timestamp=payload["sent_at"])
 
-    def send(self, data, data_type, receiver=None, sender=None, data_hash=None, timestamp=None):
+    def send(self, data, data_type, receiver=None, sender=None, message_id=None, timestamp=None):
+        started_at = time.perf_counter()
         if timestamp is None:
             timestamp = time.time()
         if sender is None:
             sender = self.host, self.port
-        payload_hash = hash((data_type, data, sender, receiver, timestamp)) if data_hash is None else data_hash
-        self.hash_history.append(payload_hash)
-        payload = {"hash": payload_hash, "type": data_type, "sender": sender, "sent_at": timestamp,
-                   "receiver": receiver, "data": data}
-        payload = json.dumps(payload)
-        payload = payload.encode()
-        for known_node in self.known_nodes:
-            self.connect(known_node["host"], known_node["port"])
-            self.outgoing_socket.send(payload)
-            self.disconnect()
+        if message_id is None:
+            message_id = self.next_message_id()
+            self.seen_messages.add(message_id)
+        targets = self.route(data_type, receiver)
+        payload = {"id": message_id, "type": data_type, "sender": sender, "sent_at": timestamp,
+                   "receiver": receiver, "data": data, "routed": targets is not None}
+        frames = {}
+        if targets is None:
+            targets = self.flood_targets(as_node_id(sender))
+        if self.suspected_nodes and data_type != "Heartbeat":
+            targets = [node_id for node_id in targets if node_id not in self.suspected_nodes]
+        # A pending update of a node is superseded by a newer version of it before it leaves the batch.
+        coalesce_key = version = None
+        if data_type == "UpdatedNode":
+            coalesce_key = "UpdatedNode", as_node_id(data[0])
+            version = Membership.version_of(data[1])
+        for host, port in targets:
+            codec = self.codec_for((host, port))
+            if codec.name not in frames:
+                frames[codec.name] = encode_frame(encode_payload(payload, codec))
+            self.send_to(host, port, frames[codec.name], key=coalesce_key, version=version)
+            self.metrics.increment("messages_out", data_type)
+        self.metrics.observe("fan_out_seconds", time.perf_counter() - started_at, data_type)
+
+    def codec_for(self, node_id):
+        # Peers advertise the codecs they can decode in their UpdatedNode data, JSON is understood by everyone.
+        if self.codec is JSONCodec:
+            return JSONCodec
+        peer_codecs = (self.known_nodes.get(node_id) or {}).get("codecs", ())
+        return self.codec if self.codec.name in peer_codecs else JSONCodec
+
+    def route(self, data_type, receiver):
+        # Returns the peers a message can be sent to directly, or None when it has to be flooded.
+        if data_type == "Heartbeat":
+            if self.routing_mode == "gossip":
+                # A random sample per round keeps heartbeats O(N log N) across the network instead of O(N²).
+                known_node_ids = list(self.known_nodes)
+                return random.sample(known_node_ids, min(self.gossip_view_size(), len(known_node_ids)))
+            return list(self.known_nodes)
+        if data_type == "ChannelMessage":
+            # Nodes whose channel is still unknown might be subscribers too.
+            return list(self.known_nodes.members_of(receiver) | self.known_nodes.members_of(None))
+        if data_type in ("InviteMessage", "SyncRequest", "SyncResponse", "HistoryRequest", "HistoryResponse"):
+            # Addressed to a node id, which is also the address to reach it at.
+            return [as_node_id(receiver)]
+        if data_type == "PrivateMessage":
+            node_id = self.known_nodes.node_id_of(receiver)
+            return [node_id] if node_id is not None else None
+        return None
 
     def on_close(self):
+        self.closing.set()
         self.send(self.get_id(), "ClosedNode")
-        self.gui.destroy()
+        self.flush()
+        self.disconnect()
+        self.metrics.close()
+        if self.history is not None:
+            self.history.close()
+        self.ui.destroy()
 
     def on_submit(self, message):
-        if exit_cmd := re.match(r"^\s*/exit\s*$", message):
-            self.on_close()
-        elif help_cmd := re.match(r"^\s*/help\s*$", message):
-            self.gui.add_line(self.T.get("help_msg"))
-        elif list_cmd := re.match(r"^\s*/list\s*$", message):
-            self.gui.add_line(self.T.list_cmd_response(self.known_channel_names()))
-        elif away_cmd := re.match(r"^\s*/away(?:\s+\"((?:[^\"\\]|\\.)*)\")?\s*$", message):
-            self.handle_away_cmd(away_cmd)
-        elif invite_cmd := re.match(r"^\s*/invite\s+\"((?:[^\"\\]|\\.)*)\"\s*$", message):
-            self.handle_invite_cmd(invite_cmd)
-        elif names_cmd := re.match(r"^\s*/names(?:\s+\"((?:[^\"\\]|\\.)*)\")?\s*$", message):
-            self.handle_names_cmd(names_cmd)
-        elif msg_cmd := re.match(r"^\s*/msg(?:\s+\"((?:[^\"\\]|\\.)*)\")?\s+\"((?:[^\"\\]|\\.)*)\"\s*$", message):
-            self.handle_msg_cmd(msg_cmd)
-        elif join_cmd := re.match(r"^\s*/join\s+\"((?:[^\"\\]|\\.)*)\"(?:\s+\"((?:[^\"\\]|\\.)*)\")?\s*$", message):
-            self.handle_join_cmd(join_cmd)
-        else:
-            self.gui.add_line(self.T.get("invalid_command"))
+        if not command_registry.dispatch(self, message):
+            self.ui.add_line(self.T.get("invalid_command"))
+
+    @command_registry.command("exit")
+    def handle_exit_cmd(self):
+        self.on_close()
 
-    def handle_away_cmd(self, away_cmd):
-        message = away_cmd.group(1)
+    @command_registry.command("help")
+    def handle_help_cmd(self):
+        self.ui.add_line(self.T.get("help_msg"))
+
+    @command_registry.command("list")
+    def handle_list_cmd(self):
+        self.ui.add_line(self.T.list_cmd_response(self.known_channel_names()))
+
+    @command_registry.command("away", max_args=1)
+    def handle_away_cmd(self, message=None):
         self.away = not self.away
         self.away_msg = None
         if self.away:
-            self.away_msg = message if message is not None and not re.match(r"^\s*$", message) else self.T.get(
-                "user_absent")
-        self.gui.add_line(self.T.away_cmd_response(self.away, self.away_msg))
+            self.away_msg = message if message is not None and message.strip() else self.T.get("user_absent")
+        self.ui.add_line(self.T.away_cmd_response(self.away, self.away_msg))
+        self.bump_version()
         self.send(self.get_self(), "UpdatedNode")
 
-    def handle_invite_cmd(self, invite_cmd):
-        invited_user = invite_cmd.group(1)
-        if invited_user not in self.known_nicknames():
-            self.gui.add_line(self.T.get("user_does_not_exist"))
+    @command_registry.command("invite", min_args=1)
+    def handle_invite_cmd(self, invited_user):
+        invited_node_id = self.known_nodes.node_id_of(invited_user)
+        if invited_node_id is None:
+            self.ui.add_line(self.T.get("user_does_not_exist"))
             return
         invite_channel = self.known_channels.get(self.current_channel)
         key = invite_channel.get("key") if invite_channel is not None else None
         message = self.T.invite_cmd_response(self.nickname, self.current_channel, key)
-        self.send(message, "InviteMessage", receiver=invited_user)
+        self.send(message, "InviteMessage", receiver=invited_node_id)
 
-    def handle_names_cmd(self, names_cmd):
-        channel_name = names_cmd.group(1)
+    @command_registry.command("names", max_args=1)
+    def handle_names_cmd(self, channel_name=None):
         if channel_name is not None and channel_name not in self.known_channels:
-            self.gui.add_line(self.T.get("channel_does_not_exist"))
+            self.ui.add_line(self.T.get("channel_does_not_exist"))
+            return
+        found_users = self.known_nodes.nicknames_in(channel_name)
+        self.ui.add_line(self.T.names_cmd_response(channel_name, found_users))
+
+    @command_registry.command("msg", min_args=1, max_args=2)
+    def handle_msg_cmd(self, *arguments):
+        nick_or_channel = arguments[0] if len(arguments) == 2 else None
+        message = arguments[-1]
+        if (nick_or_channel is not None and nick_or_channel not in self.known_channels
+                and not self.known_nodes.has_nickname(nick_or_channel)):
+            self.ui.add_line(self.T.get("user_or_channel_does_not_exist"))
             return
-        found_users = []
-        for known_node in self.known_nodes:
-            nickname = known_node["nickname"]
-            if channel_name is not None:
-                if known_node['current_channel'] == channel_name:
-                    found_users.append(nickname)
-            else:
-                found_users.append(nickname)
-        self.gui.add_line(self.T.names_cmd_response(channel_name, found_users))
-
-    def handle_msg_cmd(self, msg_cmd):
-        nick_or_channel = msg_cmd.group(1)
-        message = msg_cmd.group(2)
-        if nick_or_channel is not None and nick_or_channel not in self.known_channels and nick_or_channel not in self.known_nicknames():
-            self.gui.add_line(self.T.get("user_or_channel_does_not_exist"))
         elif nick_or_channel is None:
             nick_or_channel = self.current_channel
         is_channel = nick_or_channel in self.known_channels
         message_type = "ChannelMessage" if is_channel else "PrivateMessage"
+        if is_channel:
+            self.record_message(nick_or_channel, self.get_id(), time.time(), message)
         self.send(message, message_type, receiver=nick_or_channel)
 
-    def handle_join_cmd(self, join_cmd):
-        channel_name = join_cmd.group(1)
-        key = join_cmd.group(2)
+    @command_registry.command("join", min_args=1, max_args=2)
+    def handle_join_cmd(self, channel_name, key=None):
         is_new_channel = channel_name not in self.known_channel_names()
         if is_new_channel:
             self.known_channels[channel_name] = {"key": key}
@@ -176,21 +429,41 @@ class IRCNode(node.Node):
             channel = self.known_channels[channel_name]
             channel_key = channel.get("Key")
             if channel_key is not None and channel_key != key:
-                self.gui.add_line(self.T.get("incorrect_key"))
+                self.ui.add_line(self.T.get("incorrect_key"))
                 return
         self.current_channel = channel_name
+        self.bump_version()
         self.send(self.get_self(), "UpdatedNode")
+        if self.history_replay:
+            self.request_history(channel_name, count=self.history_replay)
+
+
+class AsyncIRCNode(IRCNode, AsyncNode):
+    pass
 
 
 if __name__ == '__main__':
-    my_nodes = n1, n2, n3 = IRCNode(node_name="n1").listen(), IRCNode(node_name="n2").listen(), IRCNode(
-        node_name="n3").listen()
-    n1.connect(n2.host, n2.port)
-    n1.send("Hello n2, I'm n1")
-    n2.connect(n1.host, n1.port)
-    n2.send("Hello n1, I'm n2")
-    n2.connect(n3.host, n3.port)
-    n2.send("Hello n3, I'm n2")
-    n2.connect(n1.host, n1.port)
-    n2.send("Hello n1, I'm n2")
-    IRCNode.wait(*my_nodes)
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Runs an IRC node, use benchmark.py to simulate a whole network.")
+    parser.add_argument("nickname")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--join", action="append", default=[], metavar="HOST:PORT",
+                        help="Address of a known node, may be repeated.")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--routing-mode", choices=("flood", "gossip"), default="flood")
+    parser.add_argument("--asyncio", action="store_true", help="Use the asyncio transport.")
+    parser.add_argument("--headless", action="store_true", help="Read commands from stdin instead of opening a window.")
+    parser.add_argument("--history-dir", help="Keep the channel messages seen by the node in this directory.")
+    parser.add_argument("--metrics-port", type=int, help="Serve the metrics of the node over HTTP on this port.")
+    arguments = parser.parse_args()
+    logging.basicConfig(format="%(message)s")
+    known_nodes = [(host, int(port)) for host, port in (address.rsplit(":", 1) for address in arguments.join)]
+    node_class = AsyncIRCNode if arguments.asyncio else IRCNode
+    irc_node = node_class(arguments.nickname, known_nodes=known_nodes, lang=arguments.lang, host=arguments.host,
+                          port=arguments.port, routing_mode=arguments.routing_mode, headless=arguments.headless,
+                          metrics_port=arguments.metrics_port, history_dir=arguments.history_dir)
+    irc_node.listen()
+    irc_node.ui.mainloop()
@@ -0,0 +1,90 @@
+import threading
+
+
+class Membership:
+    def __init__(self):
+        self.nodes = {}  # node id -> node data
+        self.nicknames = {}  # nickname -> node id
+        self.channels = {}  # channel -> node ids, None holds the nodes whose channel is unknown
+        self.removed = {}  # node id -> last version seen before its removal
+        self._lock = threading.Lock()
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __iter__(self):
+        return iter(list(self.nodes))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, node_id, default=None):
+        return self.nodes.get(node_id, default)
+
+    @staticmethod
+    def version_of(node_data):
+        # Bootstrap entries have no data yet, hence no version.
+        return (node_data or {}).get("version", -1)
+
+    def update(self, node_id, node_data):
+        # Returns True if the node was not known yet, False if it was, None if the data is outdated and ignored.
+        with self._lock:
+            version = self.version_of(node_data)
+            if version >= 0 and (version <= self.removed.get(node_id, -1)
+                                 or version <= self.version_of(self.nodes.get(node_id))):
+                return None
+            is_new_node = self.__remove(node_id) is None
+            self.nodes[node_id] = node_data
+            if node_data.get("nickname") is not None:
+                self.nicknames[node_data["nickname"]] = node_id
+            self.channels.setdefault(node_data.get("current_channel"), set()).add(node_id)
+            return is_new_node
+
+    def remove(self, node_id):
+        with self._lock:
+            node_data = self.__remove(node_id)
+            if node_data is not None:
+                self.removed[node_id] = self.version_of(node_data)
+            return node_data
+
+    def __remove(self, node_id):
+        node_data = self.nodes.pop(node_id, None)
+        if node_data is None:
+            return None
+        nickname = node_data.get("nickname")
+        if nickname is not None and self.nicknames.get(nickname) == node_id:
+            del self.nicknames[nickname]
+        channel = node_data.get("current_channel")
+        members = self.channels.get(channel)
+        if members is not None:
+            members.discard(node_id)
+            if not members:
+                del self.channels[channel]
+        return node_data
+
+    def has_nickname(self, nickname):
+        return nickname in self.nicknames
+
+    def node_id_of(self, nickname):
+        return self.nicknames.get(nickname)
+
+    def members_of(self, channel):
+        return set(self.channels.get(channel, ()))
+
+    def nicknames_in(self, channel=None):
+        if channel is None:
+            return list(self.nicknames)
+        nicknames = []
+        for node_id in self.members_of(channel):
+            nickname = self.nodes.get(node_id, {}).get("nickname")
+            if nickname is not None:
+                nicknames.append(nickname)
+        return nicknames
+
+    def digest(self):
+        return [(node_id, self.version_of(node_data)) for node_id, node_data in list(self.nodes.items())]
+
+    def delta(self, versions):
+        # Returns the records that are missing or outdated in the {node id: version} digest of another node.
+        return [(node_id, node_data) for node_id, node_data in list(self.nodes.items())
+                if self.version_of(node_data) > versions.get(node_id, -1)]
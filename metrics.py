@@ -0,0 +1,105 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, from 10µs doubling up to about 10s, the last bucket catches everything above.
+LATENCY_BUCKETS = tuple(10e-6 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile, precise to a factor of 2.
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}  # (name, label) -> value
+        self.histograms = {}  # (name, label) -> Histogram
+        self._lock = threading.Lock()
+        self.server = None
+
+    def increment(self, name, label=None, amount=1):
+        key = name, label
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, label=None):
+        key = name, label
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def get(self, name, label=None):
+        return self.counters.get((name, label), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": {self.__key_name(name, label): value for (name, label), value in self.counters.items()},
+                "histograms": {self.__key_name(name, label): histogram.snapshot()
+                               for (name, label), histogram in self.histograms.items()},
+            }
+
+    def render_text(self):
+        # One "name value" line per counter and histogram statistic, sorted by name.
+        snapshot = self.snapshot()
+        lines = [f"{name} {value}" for name, value in sorted(snapshot["counters"].items())]
+        for name, statistics in sorted(snapshot["histograms"].items()):
+            lines.extend(f"{name}.{statistic} {value}" for statistic, value in statistics.items())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host="127.0.0.1", port=0):
+        # Exposes render_text() over HTTP on every path, returns the bound (host, port).
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @staticmethod
+    def __key_name(name, label):
+        return name if label is None else f"{name}[{label}]"
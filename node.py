@@ -1,8 +1,17 @@
-import json
+import logging
+import select
 import socket
 import threading
 import time
 
+from codec import decode_payload, get_codec
+from exceptions import FrameTooLarge
+from framing import FrameDecoder
+from metrics import Metrics
+from outbound import PeerQueue
+
+LOGGING_LEVELS = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG}
+
 
 class Node:
     def __init__(self, **options):
@@ -10,60 +19,270 @@ class Node:
         self.port = options.get("port", 0)
         self.node_name = options.get("node_name", str((self.host, self.port)))
         self.max_listens = options.get("max_listens", 1024 ** 2)
+        self.reuse_port = options.get("reuse_port", False)
         self.max_recv_size = options.get("max_recv_size", 1024 ** 2)
+        self.recv_chunk_size = options.get("recv_chunk_size", 64 * 1024)
+        self.max_send_attempts = options.get("max_send_attempts", 2)
+        self.connect_timeout = options.get("connect_timeout", 3.0)
+        self.send_timeout = options.get("send_timeout", 10.0)
+        self.backoff_base = options.get("backoff_base", 0.5)
+        self.backoff_max = options.get("backoff_max", 30.0)
+        self.batch_delay = options.get("batch_delay", 0)
+        self.batch_max_bytes = options.get("batch_max_bytes", 64 * 1024)
+        self.send_queue_size = options.get("send_queue_size", 10_000)
+        self.overflow_policy = options.get("overflow_policy", "drop-oldest")
         self.logging_level = options.get("logging_level", 1)
+        self.logger = logging.getLogger(f"node.{self.node_name}")
+        self.logger.setLevel(LOGGING_LEVELS[min(max(self.logging_level, 0), 2)])
+        self.metrics = Metrics()
+        self.metrics_port = options.get("metrics_port")
         self.debug_mode = options.get("debug_mode", False)
-        self.outgoing_socket = None
+        self.codec = get_codec(options.get("codec", "json"))
         self.incoming_socket = None
+        self.connections = {}
+        self.connection_locks = {}
+        self.connections_lock = threading.Lock()
+        self.peer_queues = {}
+        self.backoffs = {}  # peer -> (consecutive failures, monotonic time of the next attempt)
+        self.closing = threading.Event()
 
     def listen(self):
         self.incoming_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.incoming_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # Lets sibling processes listen on the same port, the kernel spreads the connections among them.
+            self.incoming_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.incoming_socket.bind((self.host, self.port))
         self.port = self.incoming_socket.getsockname()[1]
         self.incoming_socket.listen(self.max_listens)
-        if self.logging_level >= 1:
-            print(f"Node {self.node_name} is listening on {self.incoming_socket.getsockname()}.")
+        self.logger.info("Node %s is listening on %s.", self.node_name, self.incoming_socket.getsockname())
         threading.Thread(target=self.__accept_connections, daemon=True).start()
+        if self.metrics_port is not None:
+            self.logger.info("Node %s serves its metrics on %s.", self.node_name,
+                             self.metrics.serve(self.host, self.metrics_port))
         return self
 
     def connect(self, host, port):
-        self.outgoing_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.outgoing_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.outgoing_socket.connect((host, port))
-        if self.logging_level >= 1:
-            print(f"Node {self.node_name} is connected to {(host, port)}.")
+        peer = host, port
+        with self.connections_lock:
+            if peer in self.connections:
+                return self
+        try:
+            outgoing_socket = socket.create_connection(peer, timeout=self.connect_timeout)
+        except OSError:
+            self.metrics.increment("connect_failures")
+            raise
+        outgoing_socket.settimeout(self.send_timeout)
+        outgoing_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.connections_lock:
+            if peer in self.connections:
+                outgoing_socket.close()
+                return self
+            self.connections[peer] = outgoing_socket
+        self.logger.info("Node %s is connected to %s.", self.node_name, peer)
         return self
 
-    def disconnect(self):
-        self.outgoing_socket.shutdown(socket.SHUT_RDWR)
-        self.outgoing_socket.close()
-        if self.logging_level >= 1:
-            print(f"Node {self.node_name} is disconnected.")
+    def disconnect(self, host=None, port=None):
+        with self.connections_lock:
+            if host is None:
+                peers = list(self.connections)
+            else:
+                peers = [(host, port)] if (host, port) in self.connections else []
+            outgoing_sockets = [self.connections.pop(peer) for peer in peers]
+        for outgoing_socket in outgoing_sockets:
+            try:
+                outgoing_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            outgoing_socket.close()
+        if peers:
+            self.logger.info("Node %s is disconnected from %s.", self.node_name, peers)
         return self
 
+    def drop_peer(self, host, port):
+        # Disconnects a peer that left and stops its writer, a later send to it starts a new one.
+        peer = host, port
+        with self.connections_lock:
+            queue, condition = self.peer_queues.pop(peer, (None, None))
+        if queue is not None:
+            with condition:
+                queue.close()
+                condition.notify_all()
+        with self.__peer_lock(peer):
+            # Taken so that a write in progress completes before the connection goes away.
+            self.disconnect(host, port)
+            with self.connections_lock:
+                self.connection_locks.pop(peer, None)
+        self.backoffs.pop(peer, None)
+        return self
+
+    def send_to(self, host, port, data, key=None, version=None):
+        # Frames are handed over to the writer of the peer, a slow peer only ever fills its own queue.
+        peer = host, port
+        if self._in_backoff(peer):
+            return False
+        queue, condition = self.__peer_queue(peer)
+        with condition:
+            queued = queue.put(data, key, version)
+            if queued:
+                condition.notify_all()
+            elif self.overflow_policy == "disconnect":
+                queue.clear()
+        if not queued:
+            self.metrics.increment("send_queue_overflows")
+        if not queued and self.overflow_policy == "disconnect":
+            self.logger.info("Node %s disconnected the slow peer %s.", self.node_name, peer)
+            self.disconnect(host, port)
+            self._back_off(peer)
+        return queued
+
+    def flush(self, timeout=1.0):
+        # Waits until every queued frame has been written, or until the timeout.
+        deadline = time.monotonic() + timeout
+        for peer, (queue, condition) in list(self.peer_queues.items()):
+            with condition:
+                while queue and (remaining := deadline - time.monotonic()) > 0:
+                    condition.wait(remaining)
+            peer_lock = self.__peer_lock(peer)
+            if peer_lock.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                peer_lock.release()
+        return self
+
+    def queue_stats(self):
+        return {peer: queue.stats() for peer, (queue, _) in list(self.peer_queues.items())}
+
+    def __peer_queue(self, peer):
+        with self.connections_lock:
+            if peer not in self.peer_queues:
+                queue = PeerQueue(capacity=self.send_queue_size, overflow_policy=self.overflow_policy)
+                self.peer_queues[peer] = queue, threading.Condition()
+                threading.Thread(target=self.__drain_peer_queue, args=(peer, *self.peer_queues[peer]),
+                                 daemon=True).start()
+            return self.peer_queues[peer]
+
+    def __drain_peer_queue(self, peer, queue, condition):
+        while True:
+            with condition:
+                while not queue and not queue.closed:
+                    condition.wait()
+                if queue.closed:
+                    return
+                deadline = queue.first_put_at + self.batch_delay
+                while queue.nbytes < self.batch_max_bytes and (remaining := deadline - time.monotonic()) > 0:
+                    condition.wait(remaining)
+            with self.__peer_lock(peer):
+                with condition:
+                    data = queue.pop_batch(self.batch_max_bytes)
+                    condition.notify_all()
+                if data:
+                    self.__write(*peer, data)
+
+    def __write(self, host, port, data):
+        peer = host, port
+        if self._in_backoff(peer):
+            return False
+        with self.__peer_lock(peer):
+            for attempt in range(self.max_send_attempts):
+                try:
+                    self.connect(host, port)
+                    outgoing_socket = self.connections[peer]
+                    if self.__is_stale(outgoing_socket):
+                        raise ConnectionResetError(f"Connection to {peer} was closed by the peer.")
+                    outgoing_socket.sendall(data)
+                    self.metrics.increment("bytes_out", amount=len(data))
+                    self.backoffs.pop(peer, None)
+                    return True
+                except (OSError, KeyError) as e:
+                    self.disconnect(host, port)
+                    self.metrics.increment("send_failures")
+                    self.logger.info("Node %s failed to send to %s (attempt %d) : %s.", self.node_name, peer,
+                                     attempt + 1, e)
+        self._back_off(peer)
+        return False
+
+    def _in_backoff(self, peer):
+        # Sends to a peer that keeps failing are dropped until its next attempt time.
+        # A single get(), writers pop the entry concurrently after each successful write.
+        backoff = self.backoffs.get(peer)
+        return backoff is not None and time.monotonic() < backoff[1]
+
+    def _back_off(self, peer):
+        failures = self.backoffs.get(peer, (0, 0))[0] + 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+        self.backoffs[peer] = failures, time.monotonic() + delay
+
+    def __peer_lock(self, peer):
+        with self.connections_lock:
+            if peer not in self.connection_locks:
+                self.connection_locks[peer] = threading.RLock()
+            return self.connection_locks[peer]
+
+    @staticmethod
+    def __is_stale(outgoing_socket):
+        # Peers never write on our outgoing connections, so anything readable is an EOF or a reset.
+        # poll() has no file descriptor limit but does not exist on Windows, whose select() has no such limit.
+        if hasattr(select, "poll"):
+            poller = select.poll()
+            poller.register(outgoing_socket, select.POLLIN)
+            readable = poller.poll(0)
+        else:
+            readable, _, _ = select.select([outgoing_socket], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return outgoing_socket.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
     def __accept_connections(self):
         while True:
             conn, addr = self.incoming_socket.accept()
-            if self.logging_level >= 1:
-                print(f"Node {self.node_name} accepted a connection from {addr}.")
+            self.logger.info("Node %s accepted a connection from %s.", self.node_name, addr)
             threading.Thread(target=self.__handle_conn, args=(conn, addr), daemon=True).start()
 
     def __handle_conn(self, conn, addr):
-        with conn:
-            data = conn.recv(self.max_recv_size).decode()
-            if self.logging_level >= 2:
-                print(f"Node {self.node_name} received data from {addr} : {data}.")
-            data = json.loads(data)
+        decoder = FrameDecoder(self.max_recv_size)
+        chunk = bytearray(self.recv_chunk_size)
+        with conn, memoryview(chunk) as chunk_view:
+            try:
+                while received := conn.recv_into(chunk):
+                    self.metrics.increment("bytes_in", amount=received)
+                    for frame in decoder.feed(chunk_view[:received]):
+                        self._handle_frame(frame, addr)
+            except FrameTooLarge as e:
+                self.logger.warning("Node %s dropped the connection from %s : %s", self.node_name, addr, e)
+                return
+            except OSError as e:
+                self.logger.info("Node %s lost the connection from %s : %r.", self.node_name, addr, e)
+                return
+        self.logger.info("Node %s closed the connection from %s.", self.node_name, addr)
+
+    def _handle_frame(self, frame, addr):
+        started_at = time.perf_counter()
+        try:
+            # An undecodable frame, unknown codec tag included, is skipped without dropping the connection.
+            data = decode_payload(frame)
+            self.logger.debug("Node %s received data from %s : %s.", self.node_name, addr, data)
             if self.debug_mode:
                 print(data)
-            else:
-                self._handle_incoming_data(data)
+                return
+            self._handle_incoming_data(data)
+        except Exception:
+            self.metrics.increment("handle_errors")
+            self.logger.exception("Node %s failed to handle data from %s.", self.node_name, addr)
+        self.metrics.observe("handle_seconds", time.perf_counter() - started_at)
+
+    def run_periodically(self, interval, callback):
+        def run():
+            while not self.closing.wait(interval):
+                callback()
+
+        threading.Thread(target=run, daemon=True).start()
 
     def _handle_incoming_data(self, data):
         raise NotImplementedError
 
-    def send(self, message, message_type, receiver=None, sender=None, data_hash=None):
+    def send(self, message, message_type, receiver=None, sender=None, message_id=None):
         raise NotImplementedError
 
     @staticmethod
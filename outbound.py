@@ -0,0 +1,85 @@
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop-oldest", "drop-new", "disconnect")
+
+
+class PeerQueue:
+    def __init__(self, capacity=None, overflow_policy="drop-oldest"):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow_policy}, expected one of {OVERFLOW_POLICIES}.")
+        self.capacity = capacity
+        self.overflow_policy = overflow_policy
+        self.entries = deque()  # [key, frame] pairs, in sending order
+        self.keyed_entries = {}
+        self.nbytes = 0
+        self.first_put_at = None
+        self.dropped = 0
+        self.max_depth = 0
+        self.closed = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, frame, key=None, version=None) -> bool:
+        # Returns False if the frame was not queued because the queue is full or closed.
+        if self.closed:
+            self.dropped += 1
+            return False
+        if key is not None and key in self.keyed_entries:
+            # A frame sharing its key with a pending one supersedes it in place, unless it is an older version.
+            entry = self.keyed_entries[key]
+            if version is not None and entry[2] is not None and version <= entry[2]:
+                return True
+            self.nbytes += len(frame) - len(entry[1])
+            entry[1] = frame
+            entry[2] = version
+            return True
+        if self.capacity is not None and len(self.entries) >= self.capacity:
+            if self.overflow_policy != "drop-oldest":
+                self.dropped += 1
+                return False
+            self.__pop_entry()
+            self.dropped += 1
+        entry = [key, frame, version]
+        self.entries.append(entry)
+        if key is not None:
+            self.keyed_entries[key] = entry
+        self.nbytes += len(frame)
+        self.max_depth = max(self.max_depth, len(self.entries))
+        if self.first_put_at is None:
+            self.first_put_at = time.monotonic()
+        return True
+
+    def pop_batch(self, max_bytes):
+        frames = []
+        size = 0
+        while self.entries and (not frames or size + len(self.entries[0][1]) <= max_bytes):
+            frame = self.__pop_entry()
+            frames.append(frame)
+            size += len(frame)
+        return b"".join(frames)
+
+    def clear(self):
+        self.dropped += len(self.entries)
+        self.entries.clear()
+        self.keyed_entries.clear()
+        self.nbytes = 0
+        self.first_put_at = None
+
+    def close(self):
+        # Drops the pending frames and tells the writer of the queue to stop.
+        self.clear()
+        self.closed = True
+
+    def __pop_entry(self):
+        key, frame, _ = self.entries.popleft()
+        if key is not None:
+            del self.keyed_entries[key]
+        self.nbytes -= len(frame)
+        if not self.entries:
+            self.first_put_at = None
+        return frame
+
+    def stats(self):
+        return {"depth": len(self.entries), "bytes": self.nbytes, "max_depth": self.max_depth, "dropped": self.dropped}
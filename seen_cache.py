@@ -0,0 +1,104 @@
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+
+class SeenCache:
+    def __init__(self, capacity=100_000, max_age=10 * 60):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+        self._entries = OrderedDict()  # message id -> local insertion time, oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, message_id):
+        return message_id in self._entries
+
+    def add(self, message_id, sent_at=None) -> bool:
+        # Returns True only the first time a message id is seen.
+        with self._lock:
+            if message_id in self._entries:
+                self.hits += 1
+                return False
+            if sent_at is not None and self.max_age is not None and sent_at < time.time() - self.max_age:
+                # Older than anything we still remember, it may already have been evicted.
+                self.stale += 1
+                return False
+            self.misses += 1
+            now = time.monotonic()
+            self._entries[message_id] = now
+            self.__evict(now)
+            return True
+
+    def __evict(self, now):
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if self.max_age is None:
+            return
+        expiry = now - self.max_age
+        while self._entries and next(iter(self._entries.values())) < expiry:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale": self.stale,
+        }
+
+
+class SharedSeenCache:
+    # Lossy seen cache in shared memory, for worker processes of one node: a message id hashes to a single slot
+    # holding its 64-bit fingerprint, a colliding id overwrites it and the older one may then be delivered twice.
+    def __init__(self, name, slots, locks, max_age=10 * 60):
+        self.memory = shared_memory.SharedMemory(name=name)
+        self.slots = self.memory.buf.cast("Q")
+        self.slot_count = slots
+        self.locks = locks  # striped, slot i is guarded by locks[i % len(locks)]
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def create(slots=1 << 20, stripes=64, context=multiprocessing):
+        # Returns the (name, slots, locks) arguments each worker passes to SharedSeenCache, and the owning memory.
+        memory = shared_memory.SharedMemory(create=True, size=slots * 8)
+        memory.buf[:] = bytes(slots * 8)
+        return (memory.name, slots, [context.Lock() for _ in range(stripes)]), memory
+
+    def add(self, message_id, sent_at=None) -> bool:
+        # Returns True only the first time a message id is seen, as far as the table remembers.
+        fingerprint = int.from_bytes(hashlib.blake2b(message_id.encode(), digest_size=8).digest(), "big") or 1
+        slot = fingerprint % self.slot_count
+        with self.locks[slot % len(self.locks)]:
+            if self.slots[slot] == fingerprint:
+                self.hits += 1
+                return False
+            if sent_at is not None and self.max_age is not None and sent_at < time.time() - self.max_age:
+                self.stale += 1
+                return False
+            self.slots[slot] = fingerprint
+        self.misses += 1
+        return True
+
+    def stats(self):
+        return {"capacity": self.slot_count, "hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+    def close(self):
+        self.slots.release()
+        self.memory.close()
@@ -1,4 +1,16 @@
+import functools
+import json
+import logging
+import os
+import threading
+from types import MappingProxyType
 from typing import Optional
+
+FALLBACK_LANG = "en"
+LANG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lang")
+logger = logging.getLogger(__name__)
+
+
 class Translations:
     _texts = {
         "": {
@@ -74,119 +86,159 @@ class Translations:
 /exit                               To exit the IRC server properly.
 """,
         },
+        "same_name_connection_refused": {
+            "fr": "Un autre utilisateur {addr} a essayé de se connecter avec le nom \"{name}\", la connexion a été "
+                  "refusée.",
+            "en": "Another user {addr} tried to connect with the name \"{name}\", the connection has been refused.",
+        },
+        "name_already_taken_connection_refused": {
+            "fr": "Le nom \"{name}\" est déjà pris, la connexion a été refusée.",
+            "en": "The name \"{name}\" has already been taken, the connection has been refused.",
+        },
+        "user_closed_connection": {
+            "fr": "\"{name}\" a fermé la connexion.",
+            "en": "\"{name}\" has closed the connection.",
+        },
+        "connected_to": {
+            "fr": "Connecté à \"{servername}\" !",
+            "en": "Connected to \"{servername}\" !",
+        },
+        "user_connected_from": {
+            "fr": "\"{name}\" a connecté depuis \"{host}:{port}\".",
+            "en": "\"{name}\" has connected from \"{host}:{port}\".",
+        },
+        "data_received_from": {
+            "fr": "Données reçues depuis \"{name}\" : \"{data}\".",
+            "en": "Data received from \"{name}\" : \"{data}\".",
+        },
+        "connection_lost": {
+            "fr": "Connexion perdue avec \"{identifier}\".",
+            "en": "Connection lost with \"{identifier}\".",
+        },
+        "connection_lost_with_server": {
+            "fr": "Connexion perdue avec le serveur \"{servername}\".",
+            "en": "Connection lost with the server \"{servername}\".",
+        },
+        "marked_away": {
+            "fr": "Vous êtes désormais marqué comme absent. Votre message d'absence est: \"{message}\".",
+            "en": "You are now marked as away. Your away message is : \"{message}\".",
+        },
+        "marked_present": {
+            "fr": "Vous êtes désormais marqué comme présent.",
+            "en": "You are now marked as present.",
+        },
+        "key_msg": {
+            "fr": " Clé : \"{key}\"",
+            "en": " Key : \"{key}\"",
+        },
+        "invite_cmd_response": {
+            "fr": "\"{name}\" vous a invité au canal \"{channel}\".{key_msg}",
+            "en": "\"{name}\" invited you to the channel \"{channel}\".{key_msg}",
+        },
+        "list_cmd_header": {
+            "fr": "Liste des canaux :",
+            "en": "List of channels :",
+        },
+        "names_cmd_header": {
+            "fr": "Liste des utilisateur dans le canal \"{channel}\" :",
+            "en": "List of users in the channel \"{channel}\" :",
+        },
+        "join_cmd_created": {
+            "fr": "Vous avez créé et rejoint avec succès le canal {channel}.{key_msg}",
+            "en": "You have successfully created and joined the channel {channel}.{key_msg}",
+        },
+        "join_cmd_joined": {
+            "fr": "Vous avez rejoint avec succès le canal {channel}.",
+            "en": "You have successfully joined the channel {channel}.",
+        },
     }
+    # Dynamic texts are str.format templates, static ones such as help_msg are never formatted.
+    _formatted = frozenset(("same_name_connection_refused", "name_already_taken_connection_refused",
+                            "user_closed_connection", "connected_to", "user_connected_from", "data_received_from",
+                            "connection_lost", "connection_lost_with_server", "marked_away", "key_msg",
+                            "invite_cmd_response", "list_cmd_header", "names_cmd_header", "join_cmd_created",
+                            "join_cmd_joined"))
+    _tables = {}  # lang -> read-only {text id: text}, shared by every instance
+    _tables_lock = threading.Lock()
 
     def __init__(self, lang):
         self.lang = lang
+        self.texts = self.table(lang)
+
+    @classmethod
+    def table(cls, lang: str):
+        # Built on first use of a language, from the builtin texts and lang/<lang>.json if it exists.
+        with cls._tables_lock:
+            if lang not in cls._tables:
+                texts = {text_id: text_by_lang[lang] for text_id, text_by_lang in cls._texts.items()
+                         if lang in text_by_lang}
+                lang_file = os.path.join(LANG_DIR, f"{lang}.json")
+                if os.path.isfile(lang_file):
+                    with open(lang_file, encoding="utf-8") as file:
+                        texts.update(json.load(file))
+                missing = [text_id for text_id in cls._texts if text_id not in texts]
+                if missing:
+                    logger.warning("%s not available in %s, defaulting to %s.", missing, lang, FALLBACK_LANG)
+                for text_id in missing:
+                    texts[text_id] = cls._texts[text_id][FALLBACK_LANG]
+                cls._tables[lang] = MappingProxyType(texts)
+            return cls._tables[lang]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _render(lang: str, text_id: str, fields: tuple = (), items: tuple = ()) -> str:
+        # Responses are memoized per language, on hashable fields and list items.
+        text = Translations.table(lang)[text_id]
+        if text_id in Translations._formatted:
+            text = text.format_map(dict(fields))
+        return "\n".join((text, *(f"- {item}" for item in items)))
 
     def get(self, text_id: str) -> str:
-        if text_id not in self._texts:
-            return "UNKNOWN_TEXT_ID"
-        text_by_lang = self._texts[text_id]
-        if self.lang in text_by_lang:
-            text = text_by_lang[self.lang]
-        else:
-            print(f"{text_id} is not available in {self.lang}, defaulting to another language.")
-            text = list(text_by_lang.values())[0]
-        return text
+        return self.texts.get(text_id, "UNKNOWN_TEXT_ID")
 
     def same_name_connection_refused(self, name: str, addr: tuple) -> str:
-        if self.lang == "fr":
-            return f"Un autre utilisateur {addr} a essayé de se connecter avec le nom \"{name}\", la connexion a " \
-                   f"été refusée."
-        else:
-            return f"Another user {addr} tried to connect with the name \"{name}\", the connection has been refused."
+        return self._render(self.lang, "same_name_connection_refused", (("name", name), ("addr", addr)))
 
     def name_already_taken_connection_refused(self, name: str) -> str:
-        if self.lang == "fr":
-            return f"Le nom \"{name}\" est déjà pris, la connexion a été refusée."
-        else:
-            return f"The name \"{name}\" has already been taken, the connection has been refused."
+        return self._render(self.lang, "name_already_taken_connection_refused", (("name", name),))
 
     def user_closed_connection(self, name: str) -> str:
-        if self.lang == "fr":
-            return f"\"{name}\" a fermé la connexion."
-        else:
-            return f"\"{name}\" has closed the connection."
+        return self._render(self.lang, "user_closed_connection", (("name", name),))
 
     def connected_to(self, servername: str) -> str:
-        if self.lang == "fr":
-            return f"Connecté à \"{servername}\" !"
-        else:
-            return f"Connected to \"{servername}\" !"
+        return self._render(self.lang, "connected_to", (("servername", servername),))
 
     def user_connected_from(self, name: str, addr: tuple) -> str:
-        if self.lang == "fr":
-            return f"\"{name}\" a connecté depuis \"{addr[0]}:{addr[1]}\"."
-        else:
-            return f"\"{name}\" has connected from \"{addr[0]}:{addr[1]}\"."
+        return self._render(self.lang, "user_connected_from", (("name", name), ("host", addr[0]), ("port", addr[1])))
 
     def data_received_from(self, name: str, data: str) -> str:
-        if self.lang == "fr":
-            return f"Données reçues depuis \"{name}\" : \"{data}\"."
-        else:
-            return f"Data received from \"{name}\" : \"{data}\"."
+        return self._render(self.lang, "data_received_from", (("name", name), ("data", data)))
 
     def connection_lost(self, identifier: str) -> str:
-        if self.lang == "fr":
-            return f"Connexion perdue avec \"{identifier}\"."
-        else:
-            return f"Connection lost with \"{identifier}\"."
+        return self._render(self.lang, "connection_lost", (("identifier", identifier),))
 
     def connection_lost_with_server(self, servername: str) -> str:
-        if self.lang == "fr":
-            return f"Connexion perdue avec le serveur \"{servername}\"."
-        else:
-            return f"Connection lost with the server \"{servername}\"."
+        return self._render(self.lang, "connection_lost_with_server", (("servername", servername),))
 
     def away_cmd_response(self, away: bool, message: str) -> str:
-        if self.lang == "fr":
-            status = "absent" if away else "présent"
-            away_message = ""
-            if away:
-                away_message = f" Votre message d'absence est: \"{message}\"."
-            return f"Vous êtes désormais marqué comme {status}.{away_message}"
-        else:
-            status = "away" if away else "present"
-            away_message = ""
-            if away:
-                away_message = f" Your away message is : \"{message}\"."
-            return f"You are now marked as {status}.{away_message}"
+        if away:
+            return self._render(self.lang, "marked_away", (("message", message),))
+        return self.texts["marked_present"]
+
+    def key_msg(self, key: Optional[str]) -> str:
+        return self._render(self.lang, "key_msg", (("key", key),)) if key else ""
 
     def invite_cmd_response(self, name: str, channel: str, key: Optional[str]) -> str:
-        if self.lang == "fr":
-            key_msg = f" Clé : \"{key}\"" if key else ""
-            return f"\"{name}\" vous a invité au canal \"{channel}\".{key_msg}"
-        else:
-            key_msg = f" Key : \"{key}\"" if key else ""
-            return f"\"{name}\" invited you to the channel \"{channel}\".{key_msg}"
+        return self._render(self.lang, "invite_cmd_response",
+                            (("name", name), ("channel", channel), ("key_msg", self.key_msg(key))))
 
     def list_cmd_response(self, channels: list) -> str:
-        channels = list(map(lambda x: f"- {x}", channels))
-        if self.lang == "fr":
-            channels.insert(0, "Liste des canaux :")
-        else:
-            channels.insert(0, "List of channels :")
-        return "\n".join(channels)
+        return self._render(self.lang, "list_cmd_header", items=tuple(channels))
 
     def names_cmd_response(self, channel: str, names: list) -> str:
-        names = list(map(lambda x: f"- {x}", names))
-        if self.lang == "fr":
-            names.insert(0, f"Liste des utilisateur dans le canal \"{channel}\" :")
-        else:
-            names.insert(0, f"List of users in the channel \"{channel}\" :")
-        return "\n".join(names)
+        return self._render(self.lang, "names_cmd_header", (("channel", channel),), tuple(names))
 
     def join_cmd_response(self, channel: str, key: str, is_new: bool) -> str:
-        if self.lang == "fr":
-            if is_new:
-                key_msg = f" Clé : \"{key}\"" if key else ""
-                return f"Vous avez créé et rejoint avec succès le canal {channel}.{key_msg}"
-            else:
-                return f"Vous avez rejoint avec succès le canal {channel}."
-        else:
-            if is_new:
-                key_msg = f" Key : \"{key}\"" if key else ""
-                return f"You have successfully created and joined the channel {channel}.{key_msg}"
-            else:
-                return f"You have successfully joined the channel {channel}."
+        if is_new:
+            return self._render(self.lang, "join_cmd_created", (("channel", channel), ("key_msg", self.key_msg(key))))
+        return self._render(self.lang, "join_cmd_joined", (("channel", channel),))